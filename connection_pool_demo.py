@@ -7,313 +7,908 @@ Two services running locally to demonstrate connection pooling concepts.
 import socket
 import threading
 import time
-import queue
-from dataclasses import dataclass
+import bisect
+import collections
+import concurrent.futures
+import operator
+import os
+import selectors
+import sys
+import tempfile
+import weakref
 from typing import Optional
 import json
+import logging
+
+log = logging.getLogger(__name__)
+
+# Hosts ServiceB serves over a Unix domain socket as well as TCP - loopback traffic
+# doesn't need the TCP stack at all
+LOCAL_HOSTS = ('localhost', '127.0.0.1')
 
 # =============================================================================
 # Service B (Server) - The service we'll connect TO
 # =============================================================================
 
+class _ClientState:
+    """Per-connection state ServiceB keeps alongside its selector registration"""
+    __slots__ = ('addr', 'connection_id', 'buffer', 'outbox')
+    
+    def __init__(self, addr, connection_id: int):
+        self.addr = addr
+        self.connection_id = connection_id
+        # Bytes received after the last complete request line
+        self.buffer = b''
+        # Response bytes the socket couldn't take yet
+        self.outbox = b''
+
 class ServiceB:
-    """Simple HTTP-like server that accepts connections"""
+    """Simple HTTP-like server that accepts connections
+    
+    Requests are newline-terminated, so a client may pipeline several on one
+    connection without waiting - responses come back in the same order.
+    """
+    
+    # Pre-encoded responses - only the timestamp and connection id vary per request,
+    # so bytes formatting replaces a json.dumps() + encode() per response
+    SUCCESS_RESPONSE = b'{"status": "success", "data": "Hello from ServiceB at %f", "connection_id": %d}\n'
+    ERROR_RESPONSE = b'{"status": "error", "message": "Unknown request"}\n'
+    
+    # Longest partial request line buffered while waiting for its newline
+    MAX_REQUEST_LINE = 8192
     
     def __init__(self, host='localhost', port=8080):
         self.host = host
         self.port = port
         self.running = False
+        # Path of the Unix domain socket once it's listening, for clients to pass to
+        # their pool. None when serving TCP only
+        self.unix_path: Optional[str] = None
         
     def start(self):
-        """Start the server in a background thread"""
+        """Open the listeners and start serving them in a background thread"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((self.host, self.port))
+        server_socket.listen(5)
+        server_socket.setblocking(False)
+        listeners = [server_socket]
+        
+        # Local clients can skip the TCP stack by connecting over a Unix socket instead
+        if self.host in LOCAL_HOSTS and hasattr(socket, "AF_UNIX"):
+            unix_socket = self._open_unix_listener()
+            if unix_socket:
+                listeners.append(unix_socket)
+        
         self.running = True
-        self.server_thread = threading.Thread(target=self._run_server)
+        self.server_thread = threading.Thread(target=self._run_server, args=(listeners,))
         self.server_thread.daemon = True
         self.server_thread.start()
-        time.sleep(0.1)  # Give server time to start
         print(f"ServiceB started on {self.host}:{self.port}")
+        if self.unix_path:
+            print(f"ServiceB also listening on {self.unix_path}")
+    
+    def _open_unix_listener(self) -> Optional[socket.socket]:
+        """Listen on a Unix domain socket, or return None to serve TCP only"""
+        # A private directory, so no other local user can squat on the path or
+        # connect to it - the predictable names in the shared temp dir allow both
+        unix_dir = tempfile.mkdtemp(prefix="serviceb-")
+        path = os.path.join(unix_dir, "serviceb.sock")
+        unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            unix_socket.bind(path)
+            unix_socket.listen(5)
+            unix_socket.setblocking(False)
+        except OSError as e:
+            print(f"ServiceB: Unix socket unavailable, serving TCP only: {e}")
+            unix_socket.close()
+            self._remove_unix_path(path)
+            return None
+        self.unix_path = path
+        return unix_socket
+    
+    @staticmethod
+    def _remove_unix_path(path: str):
+        """Delete a Unix socket file and its private directory"""
+        for remove, target in ((os.unlink, path), (os.rmdir, os.path.dirname(path))):
+            try:
+                remove(target)
+            except OSError:
+                pass
         
-    def _run_server(self):
-        """Main server loop"""
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_socket.bind((self.host, self.port))
-        server_socket.listen(5)
+    def _run_server(self, listeners):
+        """Main server loop - one selector thread serves every connection"""
+        # epoll/kqueue where available, so idle connections cost a registration
+        # rather than a blocked thread each. Listeners are registered without data
+        self.selector = selectors.DefaultSelector()
+        for listener in listeners:
+            self.selector.register(listener, selectors.EVENT_READ)
         
         while self.running:
             try:
-                client_socket, addr = server_socket.accept()
-                # Handle each connection in a new thread
-                handler_thread = threading.Thread(
-                    target=self._handle_connection, 
-                    args=(client_socket, addr)
-                )
-                handler_thread.daemon = True
-                handler_thread.start()
+                for key, events in self.selector.select(timeout=0.5):
+                    if key.data is None:
+                        self._accept_connection(key.fileobj)
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self._send_responses(key.fileobj, key.data, b'')
+                    # The write may have hit an error and closed the connection
+                    if events & selectors.EVENT_READ and key.fileobj.fileno() != -1:
+                        self._handle_ready(key.fileobj, key.data)
             except OSError:
                 break
-                
-        server_socket.close()
+        
+        # Listeners and client connections alike
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+    
+    def stop(self):
+        """Stop serving, close every socket and remove the Unix socket's directory"""
+        self.running = False
+        self.server_thread.join()
+        if self.unix_path:
+            self._remove_unix_path(self.unix_path)
+            self.unix_path = None
     
-    def _handle_connection(self, client_socket, addr):
-        """Handle a single client connection - can serve multiple requests"""
+    def _accept_connection(self, server_socket):
+        """Accept a pending connection and start watching it for requests"""
+        try:
+            client_socket, addr = server_socket.accept()
+        except BlockingIOError:
+            return  # Another wakeup already took it
+        client_socket.setblocking(False)
+        addr = addr or "unix socket"  # Unix domain peers have no address
         print(f"ServiceB: New connection from {addr}")
-        
+        self.selector.register(client_socket, selectors.EVENT_READ,
+                               _ClientState(addr, id(client_socket)))
+    
+    def _handle_ready(self, client_socket, state: _ClientState):
+        """Serve every complete request from a readable connection - can be called many times per connection"""
         try:
-            while True:
-                # Read request
-                data = client_socket.recv(1024)
-                if not data:
-                    break
-                    
-                request = data.decode('utf-8').strip()
-                print(f"ServiceB: Received request: {request}")
+            # Read requests
+            data = client_socket.recv(4096)
+            if not data:
+                self._close_connection(client_socket, state.addr)
+                return
+            
+            # Split off complete lines, keeping any partial request for the next read
+            *lines, state.buffer = (state.buffer + data).split(b'\n')
+            if len(state.buffer) > self.MAX_REQUEST_LINE:
+                # No newline in sight - a peer that never sends one shouldn't be able
+                # to grow the buffer without bound
+                print(f"ServiceB: Request line too long from {state.addr}")
+                self._close_connection(client_socket, state.addr)
+                return
+            
+            responses = []
+            for line in lines:
+                # Stay in bytes - no decode/strip round-trip just to check the verb
+                print(f"ServiceB: Received request: {line!r}")
                 
                 # Simple request processing
-                if request.startswith("GET"):
-                    response = {
-                        "status": "success", 
-                        "data": f"Hello from ServiceB at {time.time()}",
-                        "connection_id": id(client_socket)
-                    }
+                if line.startswith(b"GET"):
+                    responses.append(self.SUCCESS_RESPONSE % (time.time(), state.connection_id))
                 else:
-                    response = {"status": "error", "message": "Unknown request"}
-                
-                # Send response
-                response_str = json.dumps(response) + "\n"
-                client_socket.send(response_str.encode('utf-8'))
-                
+                    responses.append(self.ERROR_RESPONSE)
+            
+            # Send responses, in request order
+            if responses:
+                self._send_responses(client_socket, state, b''.join(responses))
+            
+        except BlockingIOError:
+            pass  # Spurious wakeup - nothing to read yet
         except Exception as e:
             print(f"ServiceB: Connection error: {e}")
-        finally:
-            print(f"ServiceB: Closing connection from {addr}")
-            client_socket.close()
+            self._close_connection(client_socket, state.addr)
+    
+    def _send_responses(self, client_socket, state: _ClientState, data: bytes):
+        """Write responses without ever dropping a short write
+        
+        sendall() can't be used on a non-blocking socket, so whatever the socket
+        doesn't take now stays in the outbox until the selector reports it writable.
+        No more requests are read from the connection until the outbox is empty.
+        """
+        state.outbox += data
+        try:
+            sent = client_socket.send(state.outbox)
+        except BlockingIOError:
+            sent = 0
+        except OSError as e:
+            print(f"ServiceB: Connection error: {e}")
+            self._close_connection(client_socket, state.addr)
+            return
+        state.outbox = state.outbox[sent:]
+        
+        # While responses are backed up, stop reading requests and only wait for the
+        # socket to drain. A client that pipelines without reading then stalls on its
+        # own send buffer instead of growing our outbox without bound
+        events = selectors.EVENT_WRITE if state.outbox else selectors.EVENT_READ
+        if self.selector.get_key(client_socket).events != events:
+            self.selector.modify(client_socket, events, state)
+    
+    def _close_connection(self, client_socket, addr):
+        """Stop watching a connection and close it"""
+        print(f"ServiceB: Closing connection from {addr}")
+        self.selector.unregister(client_socket)
+        client_socket.close()
 
 # =============================================================================
 # Connection Pool Implementation
 # =============================================================================
 
-@dataclass(unsafe_hash=True)
 class PooledConnection:
-    """Represents a pooled connection"""
-    socket: socket.socket
-    host: str
-    port: int
-    created_at: float
-    last_used: float
-    in_use: bool = False
+    """Represents a pooled connection
+    
+    Hashing and equality are by identity, which is what set membership in the pool
+    wants - last_used and in_use change while the connection sits in those sets.
+    """
+    __slots__ = ('socket', 'host', 'port', 'created_at', 'last_used', 'in_use',
+                 'pool', '_lock', '_broken', '_closed', '_pending', '_send_lock', '_receiver')
+    
+    def __init__(self, socket: socket.socket, host: str, port: int, created_at: float,
+                 last_used: float, in_use: bool = False,
+                 pool: Optional["SimpleConnectionPool"] = None):
+        self.socket = socket
+        self.host = host
+        self.port = port
+        self.created_at = created_at
+        self.last_used = last_used
+        self.in_use = in_use
+        # Owning pool, used to validate returns without a pool-wide borrowed set
+        self.pool = pool
+        # Guards in_use flips so a double return can't slip through
+        self._lock = threading.Lock()
+        # Set by the borrower when a send/recv fails, so the pool discards it on return
+        self._broken = False
+        # Set when we close the socket ourselves, so in-flight requests aren't told
+        # the peer hung up
+        self._closed = False
+        
+        # Pipelining: futures for requests sent but not yet answered, oldest first.
+        # _send_lock keeps their order identical to the order on the wire, and a
+        # receiver thread resolves them as response lines arrive
+        self._pending = collections.deque()
+        self._send_lock = threading.Lock()
+        self._receiver = None
+    
+    def __repr__(self):
+        return (f"PooledConnection(socket={self.socket!r}, host={self.host!r}, port={self.port!r}, "
+                f"last_used={self.last_used!r}, in_use={self.in_use!r})")
+    
+    def mark_broken(self):
+        """Flag the connection as unusable after an I/O failure"""
+        self._broken = True
+    
+    def request(self, payload: bytes) -> concurrent.futures.Future:
+        """Send a newline-terminated request and return a future for its response line
+        
+        Doesn't wait for the response, so the connection can go back to the pool
+        straight away and carry other requests while this one is in flight.
+        """
+        future = concurrent.futures.Future()
+        with self._send_lock:
+            if self._broken:
+                raise ConnectionError("connection is broken")
+            if self._receiver is None:
+                self._receiver = threading.Thread(target=self._receive_responses, daemon=True)
+                self._receiver.start()
+            self._pending.append(future)
+            try:
+                # send() may write only part of the payload under backpressure
+                self.socket.sendall(payload)
+            except Exception:
+                self._broken = True
+                raise
+        return future
+    
+    def _receive_responses(self):
+        """Receiver thread - match response lines to pending requests in order"""
+        error = ConnectionError("connection closed by peer")
+        try:
+            with self.socket.makefile('rb') as responses:
+                for line in responses:
+                    self._pending.popleft().set_result(line)
+        except IndexError:
+            error = ConnectionError("response received with no request pending")
+        except (OSError, ValueError) as e:
+            error = e
+        if self._closed:
+            error = ConnectionError("connection closed by the pool")
+        
+        # Fail everything still in flight. Holding the send lock means nobody can
+        # queue a new request once the connection is marked broken
+        with self._send_lock:
+            self._broken = True
+            while self._pending:
+                self._pending.popleft().set_exception(error)
     
     def is_alive(self) -> bool:
         """Check if the connection is still alive"""
+        if self._broken:
+            return False
         try:
-            # Try to get socket error status
-            error = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
-            return error == 0
+            # Peek at the socket without blocking. SO_ERROR doesn't notice a peer that
+            # closed cleanly, but a FIN shows up here as an empty read
+            if hasattr(socket, "MSG_DONTWAIT"):
+                data = self.socket.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+            else:
+                # No MSG_DONTWAIT on Windows - make the socket non-blocking for the peek
+                self.socket.setblocking(False)
+                try:
+                    data = self.socket.recv(1, socket.MSG_PEEK)
+                finally:
+                    self.socket.setblocking(True)
+            return data != b''
+        except BlockingIOError:
+            return True  # Nothing to read - idle and healthy
         except:
             return False
     
-    def is_expired(self, ttl_seconds: float) -> bool:
+    def is_expired(self, ttl_seconds: float, now: Optional[float] = None) -> bool:
         """Check if the connection has exceeded its TTL based on last usage"""
-        return (time.time() - self.last_used) > ttl_seconds
+        if now is None:
+            now = time.monotonic()
+        return (now - self.last_used) > ttl_seconds
     
     def close(self):
         """Close the underlying socket"""
+        self._closed = True
+        try:
+            # Shut down first so a receiver thread blocked reading the socket wakes up
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         try:
             self.socket.close()
         except:
             pass
 
+class _CacheOwner:
+    """Stored in a thread's locals so a finalizer can tell when the thread has exited"""
+    __slots__ = ('__weakref__',)
+
 class SimpleConnectionPool:
     """Simple connection pool implementation"""
     
-    def __init__(self, host: str, port: int, max_connections: int = 5, connection_ttl: float = 300.0):
+    def __init__(self, host: str, port: int, max_connections: int = 5, connection_ttl: float = 300.0,
+                 liveness_check_after: float = 5.0, min_connections: int = 0,
+                 unix_path: Optional[str] = None):
         self.host = host
         self.port = port
+        # Unix domain socket the target service also listens on, if it published one.
+        # Only ever connected to when given explicitly - never guessed from host/port
+        self.unix_path = unix_path
         self.max_connections = max_connections
+        self.min_connections = min(min_connections, max_connections)  # Kept open and idle ahead of demand
         self.connection_ttl = connection_ttl  # TTL in seconds (default: 5 minutes)
+        self.liveness_check_after = liveness_check_after  # Idle seconds before a connection is probed on reuse
+        
+        # Available connections waiting to be used, as a LIFO stack: borrowers take the
+        # most recently returned connection, which is the least likely to have been
+        # closed by the server, and the rest are left to expire. The stack stays ordered
+        # by last_used, so the bottom entry is always the next one to expire
+        self._idle = []
+        
+        # Per-thread cache of the connection that thread returned last, so a worker
+        # making back-to-back requests gets its own connection back without touching
+        # the shared stack. Every cache is also registered in _thread_caches so other
+        # borrowers can steal from it and the cleanup thread can flush it, until its
+        # thread exits
+        self._tls = threading.local()
+        self._thread_caches = []
         
-        # Available connections waiting to be used
-        self.available_connections = queue.Queue()
+        # Borrowers blocked on a full pool, oldest first. Returned connections are
+        # handed straight to the head waiter's future instead of being parked idle
+        self._waiters = collections.deque()
+        
+        # Guards pushes onto the idle stack and thread caches, and the waiters deque
+        self._lock = threading.Lock()
         
         # All connections we've created (for tracking)
         self.all_connections = set()
         self.all_connections_lock = threading.Lock()
         
-        # Currently borrowed connections
-        self.borrowed_connections = set()
-        self.borrowed_lock = threading.Lock()
+        # Capacity freed while borrowers were waiting, held for the waiter it was
+        # handed to so a newcomer can't create a connection in its place
+        self._reserved = 0
+        
+        # Running counts for stats and logging, so reading them costs nothing.
+        # _total_count changes only under all_connections_lock and is exact. Idle
+        # connections are pushed under _lock but claimed lock-free, so _idle_count is
+        # approximate - the cleanup thread resyncs it from the real stacks each pass
+        self._total_count = 0
+        self._idle_count = 0
         
-        # Background cleanup thread
+        # Background cleanup thread, which sleeps until the next idle connection expires
         self.cleanup_running = True
+        self._cleanup_wakeup = threading.Event()
         self.cleanup_thread = threading.Thread(target=self._cleanup_expired_connections, daemon=True)
         self.cleanup_thread.start()
         
-    def get_connection(self, timeout: float = 5.0) -> Optional[PooledConnection]:
-        """Get a connection from the pool"""
-        print(f"Pool: Requesting connection (available: {self.available_connections.qsize()}, "
-              f"total: {len(self.all_connections)})")
+        # Pre-establish min_connections in the background so the first requests
+        # don't pay for a TCP handshake
+        if self.min_connections:
+            threading.Thread(target=self._fill_min_connections, daemon=True).start()
         
-        start_time = time.time()
+    def get_connection(self, timeout: float = 5.0) -> Optional[PooledConnection]:
+        """Get a connection from the pool, or None on timeout or if connecting fails"""
+        log.debug("Pool: Requesting connection")
         
-        # Keep trying to get a valid connection from available ones
-        # this seems like a bad way to implement this...
-        # what's best practice for when all threads are in use?
-        # should we immediately try to create a new one if we're not at capacity?
-        while time.time() - start_time < timeout:
-            try:
-                conn = self.available_connections.get_nowait()
-                if conn.is_expired(self.connection_ttl):
-                    print(f"Pool: Connection {id(conn.socket)} expired (idle: {time.time() - conn.last_used:.1f}s), discarding")
-                    self._remove_connection(conn)
-                    continue  # Try to get another connection
-                elif conn.is_alive():
-                    print(f"Pool: Reusing existing connection {id(conn.socket)}")
-                    conn.in_use = True
-                    conn.last_used = time.time()
-                    with self.borrowed_lock:
-                        self.borrowed_connections.add(conn)
+        # A failed connect gives up straight away, as an unreachable target would
+        # otherwise be retried in a tight loop until the deadline
+        try:
+            # Read the clock once and share it with every check on the fast path
+            now = time.monotonic()
+            deadline = now + timeout
+            
+            # Fast path: claim an idle connection, or create one if we're under capacity.
+            # If borrowers are already queued, line up behind them instead of barging in
+            if not self._waiters:
+                conn = self._claim_available_connection(now)
+                if conn:
                     return conn
-                else:
-                    print(f"Pool: Connection {id(conn.socket)} is dead, discarding")
-                    self._remove_connection(conn)
-                    continue  # Try to get another connection
-            except queue.Empty:
-                break  # No more available connections
-        
-        # No valid available connection - try to create a new one
-        with self.all_connections_lock:
-            if len(self.all_connections) < self.max_connections:
-                conn = self._create_new_connection()
+            
+            # Pool is full - wait for a connection to be returned
+            while True:
+                now = time.monotonic()
+                remaining_timeout = deadline - now
+                if remaining_timeout <= 0:
+                    log.warning("Pool: Timeout waiting for connection")
+                    return None
+                
+                waiter = self._register_waiter()
+                if waiter is None:
+                    # Something became available while we were queueing up
+                    conn = self._claim_available_connection(now)
+                    if conn:
+                        return conn
+                    continue
+                
+                log.debug("Pool: Pool is full, waiting for available connection...")
+                try:
+                    conn = waiter.result(timeout=remaining_timeout)
+                except concurrent.futures.TimeoutError:
+                    if self._cancel_waiter(waiter):
+                        continue
+                    conn = waiter.result()  # Served just as we timed out
+                
                 if conn:
-                    print(f"Pool: Created new connection {id(conn.socket)}")
-                    self.all_connections.add(conn)
-                    with self.borrowed_lock:
-                        self.borrowed_connections.add(conn)
+                    # Hand-offs skip the idle checks, and a borrower may have flagged the
+                    # connection broken after returning it - vet it like an idle one.
+                    # Removing a bad one frees capacity, so the next pass can reconnect
+                    now = time.monotonic()
+                    if not self._check_reusable(conn, now):
+                        continue
+                    log.debug("Pool: Received handed-off connection %d", id(conn.socket))
                     conn.in_use = True
+                    conn.last_used = now
                     return conn
-        
-        # Pool is full - wait for a connection to be returned
-        print("Pool: Pool is full, waiting for available connection...")
-        remaining_timeout = timeout - (time.time() - start_time)
-        if remaining_timeout <= 0:
-            print("Pool: Timeout waiting for connection")
-            return None
-            
-        try:
-            conn = self.available_connections.get(timeout=remaining_timeout)
-            if conn.is_expired(self.connection_ttl):
-                print(f"Pool: Connection {id(conn.socket)} expired (idle: {time.time() - conn.last_used:.1f}s), discarding")
-                self._remove_connection(conn)
-                return None
-            elif conn.is_alive():
-                with self.borrowed_lock:
-                    self.borrowed_connections.add(conn)
-                conn.in_use = True
-                conn.last_used = time.time()
-                return conn
-            else:
-                self._remove_connection(conn)
-                return None
-        except queue.Empty:
-            print("Pool: Timeout waiting for connection")
-            return None
+                
+                # Woken with a reserved slot of freed capacity - create a connection in it
+                conn = self._try_create_connection(reserved=True)
+                if conn:
+                    return conn
+        except ConnectionError:
+            return None  # Already logged by _create_new_connection
     
     def return_connection(self, conn: PooledConnection):
         """Return a connection to the pool"""
-        print(f"Pool: Returning connection {id(conn.socket)}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Pool: Returning connection %d", id(conn.socket))
         
-        with self.borrowed_lock:
-            if conn not in self.borrowed_connections:
+        with conn._lock:
+            if not (conn.in_use and conn.pool is self):
                 raise ValueError("Connection was not borrowed from this pool")
-            self.borrowed_connections.remove(conn)
+            conn.in_use = False
         
-        conn.in_use = False
-        conn.last_used = time.time()
+        conn.last_used = time.monotonic()
         
-        if conn.is_expired(self.connection_ttl):
-            print(f"Pool: Connection {id(conn.socket)} expired (idle: {time.time() - conn.last_used:.1f}s), removing from pool")
+        # Connections are trusted optimistically - failures are only detected by the
+        # borrower's send/recv, which flags the connection before returning it.
+        # The TTL counts idle time from this moment, so it can't have expired yet
+        if conn._broken:
+            log.debug("Pool: Connection %d died, removing from pool", id(conn.socket))
             self._remove_connection(conn)
-        elif conn.is_alive():
-            self.available_connections.put(conn)
         else:
-            print(f"Pool: Connection {id(conn.socket)} died, removing from pool")
-            self._remove_connection(conn)
+            self._release_connection(conn)
+    
+    def _claim_available_connection(self, now: float) -> Optional[PooledConnection]:
+        """Claim a connection from this thread's cache, the idle stack, another
+        thread's cache, or failing all of those a new connect"""
+        # The thread's own cache is the common case, so try it before anything else
+        own_cache = self._thread_cache()
+        if own_cache:
+            conn = self._claim_idle_connection(own_cache, now)
+            if conn:
+                return conn
+        conn = self._claim_idle_connection(self._idle, now)
+        if conn:
+            return conn
+        # Reuse whatever another thread has parked before paying for a new connect.
+        # Caches are only added and removed under the lock, and a pass that misses
+        # one because of that just falls through to creating a connection
+        for cache in self._thread_caches:
+            if cache:
+                conn = self._claim_idle_connection(cache, now)
+                if conn:
+                    return conn
+        return self._try_create_connection()
+    
+    def _claim_idle_connection(self, stack: list, now: float) -> Optional[PooledConnection]:
+        """Pop the most recently returned usable connection off an idle stack"""
+        while stack:
+            try:
+                # list.pop() is atomic under the GIL, so claiming needs no lock
+                conn = stack.pop()
+            except IndexError:
+                return None  # Emptied by another borrower since the check
+            self._idle_count -= 1
+            
+            if self._check_reusable(conn, now):
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Pool: Reusing existing connection %d", id(conn.socket))
+                conn.in_use = True
+                conn.last_used = now
+                return conn
+        return None
+    
+    def _check_reusable(self, conn: PooledConnection, now: float) -> bool:
+        """Whether an idle connection can be borrowed again - if not, it's removed"""
+        idle_time = now - conn.last_used
+        if conn._broken:
+            log.debug("Pool: Connection %d is dead, discarding", id(conn.socket))
+        elif conn._pending:
+            # Still waiting on responses, so it isn't really idle - expiring or
+            # probing it would close the socket under the requests in flight
+            return True
+        elif idle_time > self.connection_ttl:
+            log.debug("Pool: Connection %d expired (idle: %.1fs), discarding",
+                      id(conn.socket), idle_time)
+        elif idle_time > self.liveness_check_after and not conn.is_alive():
+            # Only long-idle connections are worth a syscall - the server may have closed them
+            log.debug("Pool: Connection %d is dead, discarding", id(conn.socket))
+        else:
+            return True
+        self._remove_connection(conn)
+        return False
+    
+    def _try_create_connection(self, reserved: bool = False) -> Optional[PooledConnection]:
+        """Create a new borrowed connection if the pool is below capacity, or in a
+        slot reserved for this caller. Raises ConnectionError if the connect fails"""
+        with self.all_connections_lock:
+            if reserved:
+                self._reserved -= 1
+            elif len(self.all_connections) + self._reserved >= self.max_connections:
+                return None
+            conn = self._create_new_connection()
+            if conn:
+                log.debug("Pool: Created new connection %d", id(conn.socket))
+                self.all_connections.add(conn)
+                self._total_count += 1
+                conn.in_use = True
+                return conn
+            if reserved:
+                # Couldn't use the slot - pass it on rather than strand the next waiter
+                self._hand_capacity_to_waiter()
+        raise ConnectionError(f"could not connect to {self.host}:{self.port}")
+    
+    def _register_waiter(self) -> Optional[concurrent.futures.Future]:
+        """Queue up for the next returned connection, unless one is already available"""
+        with self._lock:
+            # Returned connections are only parked, and freed capacity only signalled,
+            # under this lock - so if neither is visible now, we can't miss them later
+            if (self._available_count()
+                    or len(self.all_connections) + self._reserved < self.max_connections):
+                return None
+            waiter = concurrent.futures.Future()
+            self._waiters.append(waiter)
+            return waiter
+    
+    def _cancel_waiter(self, waiter: concurrent.futures.Future) -> bool:
+        """Withdraw a timed-out waiter. False means it was served in the meantime -
+        results are always set under the lock, so waiter.result() is ready"""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+                return True
+            except ValueError:
+                return False
+    
+    def _release_connection(self, conn: PooledConnection):
+        """Hand a connection to the longest-waiting borrower, or park it idle"""
+        cache = self._thread_cache()
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set_result(conn)
+                return
+            if not cache:
+                cache.append(conn)
+            else:
+                self._idle.append(conn)
+            self._idle_count += 1
+    
+    def _fill_min_connections(self):
+        """Open idle connections until the pool holds at least min_connections"""
+        while True:
+            with self.all_connections_lock:
+                if len(self.all_connections) + self._reserved >= self.min_connections:
+                    return
+                conn = self._create_new_connection()
+                if conn is None:
+                    return  # Already logged - the next cleanup pass will try again
+                conn.in_use = False
+                self.all_connections.add(conn)
+                self._total_count += 1
+            log.debug("Pool: Pre-established connection %d", id(conn.socket))
+            
+            # Straight onto the shared stack - a thread cache here would belong to
+            # whichever thread happened to do the warmup
+            with self._lock:
+                if self._waiters:
+                    self._waiters.popleft().set_result(conn)
+                else:
+                    self._idle.append(conn)
+                    self._idle_count += 1
+    
+    def _thread_cache(self) -> list:
+        """The calling thread's connection cache, registered on first use"""
+        try:
+            return self._tls.cache
+        except AttributeError:
+            cache = self._tls.cache = []
+            with self._lock:
+                self._thread_caches.append(cache)
+            # A thread's locals are dropped as it exits, which unregisters its cache
+            # right away instead of leaving it for the cleanup thread
+            owner = self._tls.owner = _CacheOwner()
+            weakref.finalize(owner, self._unregister_thread_cache, cache).atexit = False
+            return cache
+    
+    def _unregister_thread_cache(self, cache: list):
+        """Drop an exited thread's cache, moving its connection back to the shared pool"""
+        with self._lock:
+            # By identity - list.remove() compares by equality, and empty caches are all equal
+            self._thread_caches = [c for c in self._thread_caches if c is not cache]
+            self._park_idle(cache)
+    
+    def _flush_thread_caches(self):
+        """Move cached connections back to the shared pool so any thread can use them"""
+        with self._lock:
+            for cache in self._thread_caches:
+                self._park_idle(cache)
+    
+    def _park_idle(self, cache: list):
+        """Move a thread cache's connection to the longest-waiting borrower or the
+        idle stack. Caller holds _lock"""
+        try:
+            conn = cache.pop()
+        except IndexError:
+            return  # Empty, or just claimed by a borrower
+        if self._waiters:
+            self._waiters.popleft().set_result(conn)
+            self._idle_count -= 1
+        else:
+            # Slot it in by age so the bottom of the stack stays the oldest
+            bisect.insort(self._idle, conn, key=operator.attrgetter("last_used"))
+    
+    def _oldest_idle_time(self) -> Optional[float]:
+        """last_used of the longest-idle connection, on the stack or in a thread cache"""
+        oldest = None
+        # The bottom of the stack is its oldest entry, and each cache holds at most one
+        for stack in [self._idle, *self._thread_caches]:
+            try:
+                last_used = stack[0].last_used
+            except IndexError:
+                continue  # Empty, or claimed since we looked
+            if oldest is None or last_used < oldest:
+                oldest = last_used
+        return oldest
+    
+    def _available_count(self) -> int:
+        """Idle connections on the shared stack and in thread caches"""
+        return len(self._idle) + sum(map(len, self._thread_caches))
+    
+    def _hand_capacity_to_waiter(self):
+        """Reserve a free slot for the longest-waiting borrower and wake it to fill it.
+        Caller holds all_connections_lock, so nobody can take the slot in between"""
+        with self._lock:
+            if self._waiters:
+                self._reserved += 1
+                self._waiters.popleft().set_result(None)
     
     def _create_new_connection(self) -> Optional[PooledConnection]:
         """Create a new connection to the target service"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((self.host, self.port))
+            sock = self._connect_unix_socket()
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.connect((self.host, self.port))
+                self._configure_socket(sock)
             
-            now = time.time()
+            now = time.monotonic()
             return PooledConnection(
                 socket=sock,
                 host=self.host,
                 port=self.port,
                 created_at=now,
                 last_used=now,
-                in_use=True
+                in_use=True,
+                pool=self
             )
         except Exception as e:
-            print(f"Pool: Failed to create connection: {e}")
+            log.warning("Pool: Failed to create connection: %s", e)
             return None
     
+    def _connect_unix_socket(self) -> Optional[socket.socket]:
+        """Connect over the target's Unix domain socket, if the pool was given one"""
+        if not self.unix_path:
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.unix_path)
+        except OSError:
+            sock.close()
+            return None  # Server gone or no longer listening there - fall back to TCP
+        return sock
+    
+    @staticmethod
+    def _configure_socket(sock: socket.socket):
+        """Tune a freshly connected socket for short request/response exchanges"""
+        # Requests are small writes followed by a wait for the reply - without this,
+        # Nagle plus delayed ACKs can stall each one by up to 40ms
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+        # Let the kernel probe idle connections, so a dead peer surfaces as a socket
+        # error (and fails is_alive) instead of on the next request
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):  # Linux - other platforms keep their defaults
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+    
     def _remove_connection(self, conn: PooledConnection):
         """Remove a connection from the pool entirely"""
         conn.close()
         with self.all_connections_lock:
-            self.all_connections.discard(conn)
+            if conn in self.all_connections:
+                self.all_connections.remove(conn)
+                self._total_count -= 1
+            # Freed capacity lets a waiter create a fresh connection
+            self._hand_capacity_to_waiter()
     
     def _cleanup_expired_connections(self):
         """Background thread to clean up expired connections"""
         while self.cleanup_running:
             try:
-                time.sleep(30)  # Check every 30 seconds
+                # Find the oldest idle connection and sleep until its deadline. With
+                # nothing idle, anything returned from now on lives at least a full TTL
+                oldest = self._oldest_idle_time()
+                if oldest is None:
+                    delay = self.connection_ttl
+                else:
+                    delay = oldest + self.connection_ttl - time.monotonic()
+                self._cleanup_wakeup.wait(max(delay, 0))
+                if not self.cleanup_running:
+                    break
+                self._flush_thread_caches()
                 
-                # Check available connections one by one without draining the entire queue
-                queue_size = self.available_connections.qsize()
-                expired_connections = []
+                # Swap the whole idle stack out under the lock and sort it off-lock, so
+                # borrowers and returns aren't held up while we check every connection
+                with self._lock:
+                    victims, self._idle = self._idle, []
                 
-                # Only check existing connections, don't wait for new ones
-                for _ in range(queue_size):
+                now = time.monotonic()
+                expired_connections = []
+                survivors = []
+                while True:
                     try:
-                        conn = self.available_connections.get_nowait()
-                        if conn.is_expired(self.connection_ttl):
-                            expired_connections.append(conn)
-                        else:
-                            # Put back non-expired connection immediately
-                            self.available_connections.put(conn)
-                    except queue.Empty:
+                        # Pop rather than iterate - a borrower that grabbed the old
+                        # stack just before the swap may still be claiming from it
+                        conn = victims.pop()
+                    except IndexError:
                         break
+                    if not conn.is_expired(self.connection_ttl, now):
+                        survivors.append(conn)
+                    elif conn._pending:
+                        # Responses still in flight - closing it would abort them. Give
+                        # it a fresh TTL from now rather than waking again straight away
+                        conn.last_used = now
+                        survivors.append(conn)
+                    else:
+                        expired_connections.append(conn)
+                
+                # Merge survivors back beneath anything returned in the meantime, oldest
+                # at the bottom. Anyone who queued up while the stack was swapped out
+                # gets served first
+                survivors.sort(key=operator.attrgetter("last_used"))
+                with self._lock:
+                    while survivors and self._waiters:
+                        self._waiters.popleft().set_result(survivors.pop())
+                    self._idle[:0] = survivors
+                    # Correct any drift from lock-free claims racing on _idle_count
+                    self._idle_count = self._available_count()
                 
                 # Remove expired connections
                 for conn in expired_connections:
-                    print(f"Pool: Background cleanup removing expired connection {id(conn.socket)} (idle: {time.time() - conn.last_used:.1f}s)")
+                    log.debug("Pool: Background cleanup removing expired connection %d (idle: %.1fs)",
+                              id(conn.socket), now - conn.last_used)
                     self._remove_connection(conn)
+                
+                # Replace anything that expired below the minimum
+                if self.min_connections:
+                    self._fill_min_connections()
                     
             except Exception as e:
-                print(f"Pool: Cleanup thread error: {e}")
+                log.exception("Pool: Cleanup thread error: %s", e)
     
     def shutdown(self):
         """Shutdown the connection pool and cleanup resources"""
-        print("Pool: Shutting down connection pool")
+        log.info("Pool: Shutting down connection pool")
         self.cleanup_running = False
+        self._cleanup_wakeup.set()
         
-        # Close all connections
+        # Stop handing this pool out from the shared registry
+        with _POOLS_LOCK:
+            holder = _POOLS.get((self.host, self.port))
+            if holder is not None and holder.pool is self:
+                del _POOLS[(self.host, self.port)]
+        
+        # Close all connections. _remove_connection takes all_connections_lock itself
         with self.all_connections_lock:
-            for conn in self.all_connections.copy():
-                self._remove_connection(conn)
+            connections = self.all_connections.copy()
+        for conn in connections:
+            self._remove_connection(conn)
     
     def get_stats(self):
         """Get pool statistics"""
+        # Unlocked reads of the running counts - a snapshot may be a moment stale
+        total = self._total_count
+        available = min(max(self._idle_count, 0), total)
         return {
-            "total_connections": len(self.all_connections),
-            "available_connections": self.available_connections.qsize(),
-            "borrowed_connections": len(self.borrowed_connections),
+            "total_connections": total,
+            "available_connections": available,
+            "borrowed_connections": total - available,
             "max_connections": self.max_connections,
+            "min_connections": self.min_connections,
             "connection_ttl": self.connection_ttl
         }
 
+class _PoolHolder:
+    """Registry placeholder for a pool that may still be under construction"""
+    __slots__ = ("lock", "pool")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pool: Optional["SimpleConnectionPool"] = None
+
+# Shared pools, one per (host, port), each behind a _PoolHolder. Lookups are a plain
+# dict probe on a tuple key; _POOLS_LOCK is only held long enough to insert a holder,
+# so a slow pool construction for one endpoint never blocks lookups for another
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(host: str, port: int, **pool_kwargs) -> SimpleConnectionPool:
+    """Get the shared pool for host:port, creating it on first use
+    
+    pool_kwargs are passed to SimpleConnectionPool, so they only take effect for
+    the call that creates the pool.
+    """
+    holder = _POOLS.get((host, port))
+    if holder is not None and holder.pool is not None:
+        return holder.pool
+    if holder is None:
+        # Interned, so later lookups with the same literal match on identity
+        host = sys.intern(host)
+        with _POOLS_LOCK:
+            holder = _POOLS.setdefault((host, port), _PoolHolder())
+    # Build the pool under the holder's own lock; callers for the same endpoint
+    # wait here, everyone else carries on
+    with holder.lock:
+        if holder.pool is None:
+            holder.pool = SimpleConnectionPool(host, port, **pool_kwargs)
+        return holder.pool
+
 # =============================================================================
 # Service A (Client) - Uses the connection pool
 # =============================================================================
@@ -321,9 +916,13 @@ class SimpleConnectionPool:
 class ServiceA:
     """Client service that uses connection pool to talk to ServiceB"""
     
-    def __init__(self, service_b_host='localhost', service_b_port=8080):
-        # Use a shorter TTL for testing (10 seconds)
-        self.pool = SimpleConnectionPool(service_b_host, service_b_port, max_connections=3, connection_ttl=10.0)
+    def __init__(self, service_b_host='localhost', service_b_port=8080, request_timeout: float = 5.0,
+                 service_b_unix_path: Optional[str] = None):
+        # Use a shorter TTL for testing (10 seconds). ServiceB's Unix socket path, when
+        # it has one, lets the pool skip TCP for a local ServiceB
+        self.pool = get_pool(service_b_host, service_b_port, max_connections=3, connection_ttl=10.0,
+                             unix_path=service_b_unix_path)
+        self.request_timeout = request_timeout  # How long to wait for a response once sent
     
     def make_request(self, request_data: str) -> Optional[str]:
         """Make a request to ServiceB using the connection pool"""
@@ -332,21 +931,27 @@ class ServiceA:
             return None
         
         try:
-            # Send request
-            request = f"GET {request_data}"
-            conn.socket.send(request.encode('utf-8'))
-            
-            # Receive response
-            response = conn.socket.recv(1024).decode('utf-8').strip()
-            
-            return response
-            
+            # Send request - the response is matched up by the connection's receiver
+            request = f"GET {request_data}\n"
+            response = conn.request(request.encode('utf-8'))
         except Exception as e:
             print(f"ServiceA: Request failed: {e}")
+            # Let the pool discard the connection instead of handing it out again
+            conn.mark_broken()
             return None
         finally:
-            # Always return connection to pool
+            # The connection is only held while sending, so other requests can be
+            # pipelined on it while we wait for our response
             self.pool.return_connection(conn)
+        
+        try:
+            # Receive response
+            return response.result(timeout=self.request_timeout).decode('utf-8').strip()
+        except Exception as e:
+            print(f"ServiceA: Request failed: {e!r}")
+            # A stalled connection would hold up everything pipelined behind us
+            conn.mark_broken()
+            return None
     
     def get_pool_stats(self):
         """Get connection pool statistics"""
@@ -357,6 +962,9 @@ class ServiceA:
 # =============================================================================
 
 def main():
+    # Pool internals log at DEBUG; raise the level to watch individual borrows and returns
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     print("=== Connection Pool Demo ===\n")
     
     # Start ServiceB
@@ -364,7 +972,7 @@ def main():
     service_b.start()
     
     # Create ServiceA with connection pool
-    service_a = ServiceA()
+    service_a = ServiceA(service_b_unix_path=service_b.unix_path)
     
     print(f"Initial pool stats: {service_a.get_pool_stats()}")
     print()
@@ -428,8 +1036,9 @@ def main():
     
     print(f"Pool stats after TTL expiry: {service_a.get_pool_stats()}")
     
-    # Shutdown the pool cleanly
+    # Shutdown the pool and the server cleanly
     service_a.pool.shutdown()
+    service_b.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file